@@ -1,5 +1,7 @@
+import numpy as np
 import pandas as pd
-from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Union
 
 hourly_rates = {
     pd.Timestamp("2022-06-14 13:00"): 1500,
@@ -7,6 +9,12 @@ hourly_rates = {
     pd.Timestamp("2022-06-14 15:00"): 3000,
     pd.Timestamp("2022-06-14 16:00"): 780,
 }
+hourly_rate_series = pd.Series(hourly_rates).sort_index()
+
+EVENT_START = pd.Timestamp("2022-06-14 13:00:00")
+EVENT_END = pd.Timestamp("2022-06-14 16:45:00")
+BASELINE_START = EVENT_START - pd.offsets.BusinessDay(10)
+BASELINE_END = EVENT_END - pd.offsets.BusinessDay(1)
 
 
 def construct_df():
@@ -19,13 +27,23 @@ def construct_df():
     # This is more easily done reading from a json or pre-made csv
     miso_baselines = {1: 10700, 2: 5400, 3: 850, 5: 9000, 6: 350}
     customer_profit_share = {1: 0.64, 2: 0.62, 3: 0.56, 5: 0.65, 6: 0.51}
-    df = pd.DataFrame([miso_baselines, customer_profit_share]).transpose()
-    df["Average Performance (10 of 10)"] = ""
-    df["Average Performance (FSL)"] = ""
-    df["Revenue"] = ""
-    df["Customer Share"] = ""
-    df["Voltus Share"] = ""
-    return df.rename(columns={0: "MISO FSL Baseline", 1: "Profit Share%"})
+    df = pd.DataFrame(
+        {
+            "MISO FSL Baseline": pd.Series(miso_baselines, dtype="int64"),
+            "Profit Share%": pd.Series(customer_profit_share, dtype="float64"),
+        }
+    )
+    # Allocate the output columns together as a single float64 block
+    return df.reindex(
+        columns=[
+            *df.columns,
+            "Average Performance (10 of 10)",
+            "Average Performance (FSL)",
+            "Revenue",
+            "Customer Share",
+            "Voltus Share",
+        ]
+    )
 
 
 def get_site_data(
@@ -42,52 +60,80 @@ def get_site_data(
     Returns:
         pd.DataFrame: Single column df, indexed by timestamps.
     """
-    series = pd.read_csv(file_path)
-    series["Interval Beginning (EST)"] = series["Interval Beginning (EST)"].apply(
-        pd.Timestamp
+    return pd.read_csv(
+        file_path,
+        parse_dates=[index_header],
+        date_format="%m/%d/%Y %H:%M",
+        index_col=index_header,
+    )
+
+
+def _hourly_sum(series: pd.Series) -> pd.Series:
+    """Sums a sorted interval series into hourly totals, indexed by the start of each hour
+
+    Args:
+        series (pd.Series): interval series, indexed with ascending timestamps
+
+    Returns:
+        pd.Series: hourly totals
+    """
+    hours = series.index.floor("h")
+    # Rows of an hour are contiguous, so run-start offsets replace the hash groupby
+    starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]]) if len(hours) else []
+    return pd.Series(
+        np.add.reduceat(series.to_numpy(np.float64), starts), index=hours[starts]
     )
-    return series.set_index("Interval Beginning (EST)")
 
 
 def get_10of10_baselines(
-    data: pd.Series = get_site_data(),
-    event_start=pd.Timestamp("2022-06-14 13:00:00"),
-    event_end=pd.Timestamp("2022-06-14 16:45:00"),
+    data: Optional[pd.Series] = None,
+    event_start: pd.Timestamp = EVENT_START,
+    event_end: pd.Timestamp = EVENT_END,
 ) -> pd.Series:
     """Given a customer's site data, the event time range, returns the customer's baseline performance for that date using the MISO 10of10 methodology
 
     The 10of10 calculation metholody uses the mean of the 10 proceeding, non event, non weekend dates' daily average performance.
 
     Args:
-        data (pd.DataFrame, optional): A customer's site data as a df. Defaults to site 1 data.
+        data (pd.Series, optional): A customer's site kWh series. Defaults to site 1 data.
         event_start (pd.Timestamp, optional): starting timestamp of event. Defaults to pd.Timestamp("2022-06-14 13:00:00").
-        event_end (pd.Timestamp, optional): ending timestamp of event. Defaults to pd.Timestamp("2022-06-14 13:00:00").
+        event_end (pd.Timestamp, optional): ending timestamp of event. Defaults to pd.Timestamp("2022-06-14 16:45:00").
 
     Returns:
-        float: The calculated baseline
+        pd.Series: The hourly baselines, indexed by event hour
     """
 
-    data = data.loc[
-        event_start - pd.offsets.BusinessDay(10) : event_end - pd.offsets.BusinessDay(1)
-    ]  # Get the past 10 business days worth of data
+    if data is None:
+        data = get_site_data()["kWh"]
+    # Get the past 10 business days worth of data, precomputed for the default event
+    if event_start == EVENT_START and event_end == EVENT_END:
+        baseline_start, baseline_end = BASELINE_START, BASELINE_END
+    else:
+        baseline_start = event_start - pd.offsets.BusinessDay(10)
+        baseline_end = event_end - pd.offsets.BusinessDay(1)
+    data = data.loc[baseline_start:baseline_end]
     data = data[data.index.dayofweek < 5]  # Eliminate any weekend data
-    data = data.groupby(
-        data.index.floor("h")
-    ).sum()  # Aggregate hourly performance across the whole series
-    return pd.Series(
-        {
-            i: data[data.index.hour == i.hour].mean()
-            for i in pd.date_range(
-                event_start, event_end, freq="h"
-            )  # Filter for measurements for each hour (2 P.M - 6 P.M), and get the mean()
-        }
-    )
+    data = _hourly_sum(data)  # Aggregate hourly performance across the whole series
+    # Average each hour of the day in one pass, then keep the event hours (2-6 P.M)
+    by_hour = data.groupby(data.index.hour).mean()
+    event_hours = pd.date_range(event_start, event_end, freq="h")
+    return pd.Series(by_hour.reindex(event_hours.hour).to_numpy(), index=event_hours)
+
+
+def _average_performance(hourly: pd.Series, baseline: Union[pd.Series, float]) -> float:
+    """Averages a baseline minus a site's hourly load totals"""
+    if not len(hourly):
+        raise ValueError("customer_series has no readings to compare to the baseline")
+    if isinstance(baseline, pd.Series):
+        # Match hours by timestamp; hours missing from either side are skipped
+        return float(baseline.sub(hourly).mean())
+    return float(np.nanmean(baseline - hourly.to_numpy()))
 
 
 def customer_performance_from_baseline(
     customer_series, baseline: Union[pd.Series, float]
 ) -> float:
-    """Given a slice of the customer's 15 minute interval data and baseline kW measurement, returns the average performance relative to the given baseline over the course of the event. Assumes 15 minute intervals
+    """Given a slice of the customer's 15 minute interval data and baseline kW measurement, returns the average performance relative to the given baseline over the course of the event
 
     Args:
         customer_series (pd.Series): 15 minute interval series (indexed with timestamps, EST) of customer performance
@@ -95,66 +141,98 @@ def customer_performance_from_baseline(
 
     Returns:
         float: The average hourly performance
+
+    Raises:
+        ValueError: if customer_series is empty
     """
-    return (
-        baseline - customer_series.groupby(customer_series.index.floor("h")).sum()
-    )
+    return _average_performance(_hourly_sum(customer_series), baseline)
+
+
+def _hourly_revenue(
+    hourly: pd.Series,
+    baseline: pd.Series,
+    hourly_payout_rates: Union[dict, pd.Series],
+) -> Tuple[pd.Index, np.ndarray, np.ndarray]:
+    """Returns the event's hours with their performance and clipped revenue
+
+    Hours come from aligning the baseline with the customer's hourly totals, so hours
+    of either are kept; hours without a rate get NaN revenue.
+    """
+    if isinstance(hourly_payout_rates, dict):
+        hourly_payout_rates = pd.Series(hourly_payout_rates)
+    performance = baseline - hourly
+    hours = performance.index
+
+    # Look up each hour's rate once, then derive everything from plain arrays
+    performance = performance.to_numpy()
+    rates = hourly_payout_rates.reindex(hours).to_numpy()
+    revenue = performance * rates / 1000
+    np.maximum(revenue, 0.0, out=revenue)
+    return hours, performance, revenue
 
 
 def calculate_payouts(
     customer_series: pd.Series,
-    baseline: pd.Series = get_10of10_baselines(),
+    baseline: Optional[pd.Series] = None,
     customer_profit_share: float = 0.64,
-    hourly_payout_rates: dict = hourly_rates,
+    hourly_payout_rates: Union[dict, pd.Series] = hourly_rate_series,
 ):
-    df = customer_series.groupby(customer_series.index.floor("h")).sum()
-
-    df = pd.DataFrame((baseline - df), columns=["Performance"])
-    df["Revenue"] = (df["Performance"] * pd.Series(hourly_payout_rates) / 1000).apply(
-        lambda x: max(x, 0)
+    if baseline is None:
+        baseline = get_10of10_baselines()
+    hours, performance, revenue = _hourly_revenue(
+        _hourly_sum(customer_series), baseline, hourly_payout_rates
     )
-    df["Customer Share"] = df["Revenue"] * customer_profit_share
-    df["Voltus Share"] = df["Revenue"] - df["Customer Share"]
-    return df
+    customer_share = revenue * customer_profit_share
+    return pd.DataFrame(
+        {
+            "Performance": performance,
+            "Revenue": revenue,
+            "Customer Share": customer_share,
+            "Voltus Share": revenue - customer_share,
+        },
+        index=hours,
+    )
+
+
+def _load_site(site_id: int) -> pd.DataFrame:
+    """Loads a site's data, tagged with its site number for stacking"""
+    return get_site_data("files/site_" + str(site_id) + ".csv").assign(site_id=site_id)
 
 
 def main():
     df = construct_df()
 
-    for i in [1, 2, 3, 5, 6]:
-        site_data = get_site_data("files/site_" + str(i) + ".csv")
-        df.loc[i, "Average Performance (FSL)"] = customer_performance_from_baseline(
-            site_data.loc[
-                pd.Timestamp("2022-06-14 13:00:00") : pd.Timestamp(
-                    "2022-06-14 16:45:00"
-                )
-            ]["kWh"],
-            df.loc[i, "MISO FSL Baseline"],
-        ).mean()
-
-        df.loc[
-            i, "Average Performance (10 of 10)"
-        ] = customer_performance_from_baseline(
-            site_data.loc[
-                pd.Timestamp("2022-06-14 13:00:00") : pd.Timestamp(
-                    "2022-06-14 16:45:00"
-                )
-            ]["kWh"],
-            get_10of10_baselines(site_data["kWh"]),
-        ).mean()
-
-        payouts = calculate_payouts(
-            site_data["kWh"].loc[
-                pd.Timestamp("2022-06-14 13:00:00") : pd.Timestamp(
-                    "2022-06-14 16:45:00"
-                )
-            ],
-            get_10of10_baselines(site_data["kWh"]),
-            df["Profit Share%"].loc[i],
-        ).sum()
-        df.loc[i, "Revenue"] = payouts["Revenue"]
-        df.loc[i, "Customer Share"] = payouts["Customer Share"]
-        df.loc[i, "Voltus Share"] = payouts["Voltus Share"]
+    # Load the independent site files concurrently and stack them into one frame
+    with ThreadPoolExecutor(max_workers=len(df.index)) as executor:
+        all_data = pd.concat(executor.map(_load_site, df.index))
+
+    # Each site goes through the same single-site helpers as interactive use
+    results = {}
+    for site_id, kwh in all_data.groupby("site_id")["kWh"]:
+        # The event's hourly totals feed both performance averages and the payouts
+        hourly = _hourly_sum(kwh.loc[EVENT_START:EVENT_END])
+        baseline = get_10of10_baselines(kwh)
+        _, _, revenue = _hourly_revenue(hourly, baseline, hourly_rate_series)
+        revenue_total = np.nansum(revenue)
+        customer_share = revenue_total * df.loc[site_id, "Profit Share%"]
+        results[site_id] = [
+            _average_performance(hourly, baseline),
+            _average_performance(hourly, df.loc[site_id, "MISO FSL Baseline"]),
+            revenue_total,
+            customer_share,
+            revenue_total - customer_share,
+        ]
+
+    # Fill every output column with one bulk assignment
+    output_columns = [
+        "Average Performance (10 of 10)",
+        "Average Performance (FSL)",
+        "Revenue",
+        "Customer Share",
+        "Voltus Share",
+    ]
+    df.loc[list(results), output_columns] = np.array(list(results.values()))
     return df
 
-print(main())
\ No newline at end of file
+
+print(main())